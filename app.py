@@ -16,21 +16,120 @@ ambiente.  Execute-o com o comando:
 
     streamlit run app.py
 
-O código utiliza apenas bibliotecas amplamente disponíveis (pandas e
-fpdf).  Caso a biblioteca fpdf não esteja instalada, ela pode ser
-adicionada via pip (pip install fpdf).
+O código utiliza apenas bibliotecas amplamente disponíveis (pandas, numpy
+e fpdf2).  Caso a biblioteca fpdf2 não esteja instalada, ela pode ser
+adicionada via pip (pip install fpdf2).
 """
 
 from __future__ import annotations
 
+import csv
 import io
-from typing import Optional
+from typing import IO, Optional
 
+import numpy as np
 import pandas as pd
-from fpdf import FPDF  # type: ignore
 import streamlit as st
 
 
+# Colunas lidas do CSV de precificação em lote; as demais são descartadas.
+_COLUNAS_LOTE = ["nome_produto", "preco_cardapio", "taxa_ifood", "custo_logistica"]
+
+# Logo da Agência exibido no topo da página.
+_CAMINHO_LOGO = "Ativo 1.png"
+
+# Colunas do histórico de precificações.  O histórico contém apenas as colunas
+# essenciais: nome, preço de cardápio, taxa do iFood, custo de logística e preço
+# sugerido.  Campos de impostos, margem, embalagem e desconto foram removidos.
+_COLUNAS_HISTORICO = [
+    "Nome do Produto",
+    "Preço Cardápio (R$)",
+    "Taxa iFood (%)",
+    "Custo Logística (R$)",
+    "Preço Sugerido iFood (R$)",
+]
+
+# Número máximo de cálculos mantidos no histórico da sessão.
+_MAX_HISTORICO = 1000
+
+# Planos do iFood e suas taxas em porcentagem.  ``None`` indica taxa informada
+# manualmente pelo usuário.
+_PLANOS_IFOOD: dict[str, Optional[float]] = {
+    "Básico (27%)": 27.0,
+    "Intermediário (21%)": 21.0,
+    "Parceiro de Entrega (16.5%)": 16.5,
+    "Próprio (12%)": 12.0,
+    "Personalizado": None,
+}
+
+# Tabela de detalhamento do cálculo individual, em Markdown.  O "$" é escapado
+# para que o Streamlit não interprete os valores como fórmulas LaTeX.
+_TABELA_DETALHAMENTO = """
+| Item | Valor |
+| --- | --- |
+| Preço no cardápio | R\\$ {preco_cardapio:.2f} |
+| Custo logística | R\\$ {custo_logistica:.2f} |
+| Taxa iFood | {taxa_ifood:.1f} % |
+| Preço sugerido | R\\$ {preco_sugerido:.2f} |
+"""
+
+# Estilos CSS personalizados para botões e componentes.  Definidos uma única vez
+# no módulo, já que o Streamlit reexecuta main() a cada interação.
+_CSS_PERSONALIZADO = """
+<style>
+/* Botão Calcular dentro do formulário */
+form button[type="submit"] {
+    background-color: #333333 !important;
+    color: #FFFFFF !important;
+    width: 100% !important;
+}
+/* Primeiro botão de download (Baixar CSV) */
+div[data-testid="stDownloadButton"]:first-of-type button {
+    background-color: #007BFF !important;
+    color: #FFFFFF !important;
+    width: 100% !important;
+}
+/* Botões do PDF: "Preparar PDF" e, depois dele, o download (Baixar PDF) */
+.st-key-preparar_pdf button,
+div[data-testid="stDownloadButton"]:nth-of-type(2) button {
+    background-color: #000000 !important;
+    color: #FFFFFF !important;
+    width: 100% !important;
+}
+/* Botão para limpar histórico */
+.st-key-limpar_historico button {
+    background-color: #DC3545 !important;
+    color: #FFFFFF !important;
+}
+</style>
+"""
+
+
+def _calcular_preco(
+    preco_cardapio: float, taxa_ifood: float, custo_logistica: float
+) -> Optional[float]:
+    """Calcula o preço sugerido no iFood a partir dos três campos usados no app.
+
+    O cálculo baseia‑se na seguinte fórmula:
+
+        preco_sugerido = (preco_cardapio + custo_logistica) / (1 - taxa_ifood / 100)
+
+    Args:
+        preco_cardapio: preço do produto no cardápio físico.
+        taxa_ifood: soma das taxas do iFood em porcentagem.
+        custo_logistica: custo unitário de entrega ou logística.
+
+    Returns:
+        O preço sugerido.  Retorna ``None`` se a taxa resultar em 100 % ou
+        mais.
+    """
+    taxa_total = taxa_ifood / 100.0
+    # Evitar divisão por zero ou porcentagens absurdas
+    if taxa_total >= 1.0:
+        return None
+    return round((preco_cardapio + custo_logistica) / (1.0 - taxa_total), 2)
+
+
 def calcular_preco_ifood(
     preco_cardapio: float,
     taxa_ifood: float,
@@ -42,7 +141,10 @@ def calcular_preco_ifood(
 ) -> Optional[float]:
     """Calcula o preço sugerido no iFood considerando diversas variáveis.
 
-    O cálculo baseia‑se na seguinte fórmula:
+    Mantida apenas por compatibilidade (obsoleta): o app usa diretamente
+    :func:`_calcular_preco`.  Os campos extras são incorporados aos três
+    argumentos de :func:`_calcular_preco`, de modo que a fórmula continua
+    sendo:
 
         preco_sugerido = custo_total / (1 - taxa_total)
 
@@ -60,28 +162,50 @@ def calcular_preco_ifood(
 
     Returns:
         O preço sugerido.  Retorna ``None`` se a soma das porcentagens
-        resultar em 100 % ou mais.
+        resultar em 100 % ou mais.
     """
-    custo_total = preco_cardapio + custo_embalagem + custo_logistica
-    taxa_total = (taxa_ifood + impostos + margem - desconto) / 100.0
-    # Evitar divisão por zero ou porcentagens absurdas
-    if taxa_total >= 1.0:
-        return None
-    preco_sugerido = custo_total / (1.0 - taxa_total)
-    return round(preco_sugerido, 2)
+    return _calcular_preco(
+        preco_cardapio + custo_embalagem,
+        taxa_ifood + impostos + margem - desconto,
+        custo_logistica,
+    )
+
 
+def _calcular_preco_arrays(
+    preco_cardapio: np.ndarray, taxa_ifood: np.ndarray, custo_logistica: np.ndarray
+) -> np.ndarray:
+    """Aplica a fórmula de :func:`_calcular_preco` sobre arrays do NumPy.
+
+    Args:
+        preco_cardapio: preços de cardápio (``float64``).
+        taxa_ifood: taxas do iFood em porcentagem (``float64``).
+        custo_logistica: custos de logística (``float64``).
+
+    Returns:
+        Array com o preço sugerido de cada posição, arredondado em duas
+        casas.  Posições cuja taxa resulte em 100 % ou mais recebem ``0.0``.
+    """
+    custo_total = preco_cardapio + custo_logistica
+    taxa_total = taxa_ifood / 100.0
+    # As linhas inválidas são descartadas pelo np.where; suprime os avisos da divisão
+    with np.errstate(divide="ignore", invalid="ignore"):
+        preco = np.where(taxa_total >= 1.0, 0.0, custo_total / (1.0 - taxa_total))
+    return np.round(preco, 2)
 
+
+@st.cache_data(show_spinner=False, max_entries=32)
 def gerar_pdf_tabela(df: pd.DataFrame, titulo: str) -> bytes:
     """Gera um PDF simples a partir de um DataFrame.
 
-    O PDF contém um título e uma tabela com as colunas do DataFrame.  Para
-    maximizar a compatibilidade com diferentes versões da biblioteca
-    ``fpdf``/``fpdf2``, esta função tenta primeiro produzir o PDF via
-    ``dest='S'`` (que normalmente retorna uma string ou bytes).  Caso
-    ocorra algum erro (ou o retorno não seja um tipo esperado), ele
-    recorre a gravar o conteúdo em um ``BytesIO``.  No final, sempre
-    retorna um objeto ``bytes``, conforme exigido pela API do
-    ``streamlit.download_button``.
+    O PDF contém um título e uma tabela com as colunas do DataFrame.  Os
+    valores são convertidos para texto coluna a coluna antes do desenho da
+    tabela (decimais com duas casas).  A tabela é montada pela API
+    ``pdf.table()`` do ``fpdf2``, que calcula a geometria uma única vez e
+    cuida das quebras de página e da repetição do cabeçalho.  Como
+    ``pdf.output()`` devolve um ``bytearray``, o conteúdo é convertido para
+    ``bytes`` conforme exigido pela API do ``streamlit.download_button``.
+    O resultado fica em cache (``st.cache_data``), de modo que o PDF só é
+    gerado novamente quando o DataFrame ou o título mudam.
 
     Args:
         df: DataFrame a ser exportado.
@@ -90,6 +214,9 @@ def gerar_pdf_tabela(df: pd.DataFrame, titulo: str) -> bytes:
     Returns:
         Conteúdo do PDF em bytes.
     """
+    # Importação tardia: o fpdf só é carregado quando um PDF é de fato pedido
+    from fpdf import FPDF  # type: ignore
+
     pdf = FPDF()
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.add_page()
@@ -97,70 +224,212 @@ def gerar_pdf_tabela(df: pd.DataFrame, titulo: str) -> bytes:
     pdf.cell(0, 10, titulo, ln=True, align="C")
     pdf.ln(5)
     pdf.set_font("Arial", size=10)
-    # Calcula largura das colunas proporcionalmente ao número de colunas
-    col_width = pdf.w / (len(df.columns) + 1)
-    # Cabeçalho da tabela
-    for col in df.columns:
-        pdf.cell(col_width, 8, txt=str(col), border=1, align="C")
-    pdf.ln()
-    # Linhas da tabela
-    for _, row in df.iterrows():
-        for item in row:
-            pdf.cell(col_width, 8, txt=str(item), border=1, align="C")
-        pdf.ln()
-    # Tenta gerar o conteúdo via dest='S' (string) para maior compatibilidade
-    try:
-        pdf_content = pdf.output(dest="S")  # type: ignore[no-untyped-call]
-        # O método pode retornar ``str`` (em python 2/algumas versões) ou ``bytes``.
-        if isinstance(pdf_content, bytes):
-            return pdf_content
-        elif isinstance(pdf_content, str):
-            # Converte string para bytes usando latin-1
-            return pdf_content.encode("latin-1")
-        else:
-            # Qualquer outro tipo não é esperado; convertemos via buffer
-            raise TypeError
-    except Exception:
-        # Fallback: grava em buffer e lê bytes
-        buffer = io.BytesIO()
-        pdf.output(buffer)  # type: ignore[no-untyped-call]
-        return buffer.getvalue()
-
-
-def carregar_csv_em_lote(csv_bytes: bytes) -> pd.DataFrame:
+    cabecalho = [str(col) for col in df.columns]
+    # Linhas da tabela, já convertidas para texto coluna a coluna em listas
+    # simples.  Colunas decimais são formatadas com duas casas, sem passar pelo
+    # repr de cada float.
+    colunas = [
+        (serie.map("{:.2f}".format) if pd.api.types.is_float_dtype(serie) else serie.astype(str)).tolist()
+        for _, serie in df.items()
+    ]
+    with pdf.table(text_align="CENTER", line_height=8) as tabela:
+        tabela.row(cabecalho)
+        for row in zip(*colunas):
+            tabela.row(row)
+    return bytes(pdf.output())
+
+
+def gerar_csv_bytes(df: pd.DataFrame) -> bytes:
+    """Serializa um DataFrame em CSV (UTF‑8) para download.
+
+    O conteúdo é gravado diretamente em um ``BytesIO``, sem montar antes uma
+    ``str`` com o arquivo inteiro para depois codificá‑la.  As colunas
+    decimais são escritas com duas casas.  A função não tem cache próprio:
+    ela é chamada apenas por :func:`_processar_lote`, que já guarda o CSV
+    gerado no seu cache.
+
+    Args:
+        df: DataFrame a ser exportado.
+
+    Returns:
+        Conteúdo do CSV em bytes.
+    """
+    buffer = io.BytesIO()
+    df.to_csv(
+        buffer,
+        index=False,
+        encoding="utf-8",
+        float_format="%.2f",
+        lineterminator="\n",
+    )
+    return buffer.getvalue()
+
+
+def gerar_csv_historico(linhas: list[dict], colunas: list[str]) -> bytes:
+    """Serializa o histórico de precificações em CSV (UTF‑8) para download.
+
+    Usa o módulo ``csv`` da biblioteca padrão diretamente sobre a lista de
+    dicionários guardada na sessão, sem passar pelo escritor do pandas, e
+    grava os bytes direto em um ``BytesIO``.  O resultado não é posto em
+    cache: calcular a chave de cache de uma lista de dicionários custaria
+    tanto quanto gerar o próprio arquivo.
+
+    Args:
+        linhas: linhas do histórico, uma por cálculo.
+        colunas: ordem das colunas no arquivo.
+
+    Returns:
+        Conteúdo do CSV em bytes.
+    """
+    buffer = io.BytesIO()
+    # Codifica em UTF‑8 à medida que escreve, sem montar uma str com o arquivo
+    texto = io.TextIOWrapper(buffer, encoding="utf-8", newline="")
+    escritor = csv.DictWriter(texto, fieldnames=colunas, lineterminator="\n")
+    escritor.writeheader()
+    escritor.writerows(linhas)
+    texto.flush()
+    # Desacopla o wrapper para que ele não feche o buffer ao ser descartado
+    texto.detach()
+    return buffer.getvalue()
+
+
+def carregar_csv_em_lote(arquivo: IO[bytes]) -> pd.DataFrame:
     """Lê um CSV enviado pelo usuário e retorna um DataFrame.
 
     Espera‑se que o CSV contenha ao menos as colunas ``nome_produto`` e
     ``preco_cardapio``.  Os campos opcionais mais relevantes são
-    ``taxa_ifood`` e ``custo_logistica``.  As colunas relacionadas a
-    impostos, margens, embalagens ou descontos são preservadas apenas
-    por compatibilidade, mas seus valores serão ignorados.  Valores
-    ausentes serão preenchidos com padrões.
+    ``taxa_ifood`` e ``custo_logistica``.  Colunas relacionadas a
+    impostos, margens, embalagens ou descontos podem estar presentes por
+    compatibilidade, mas são descartadas já na leitura.  Valores
+    ausentes serão preenchidos com padrões.  A leitura usa o motor
+    ``pyarrow`` do pandas, mais rápido que o motor padrão (usado como
+    alternativa caso o ``pyarrow`` não esteja instalado), diretamente sobre
+    o arquivo recebido (sem copiar seu conteúdo para outro buffer).  Apenas
+    as colunas usadas no cálculo são lidas, e as numéricas já chegam como
+    ``float64``, com células vazias preenchidas com 0.
 
     Args:
-        csv_bytes: arquivo CSV em bytes.
+        arquivo: arquivo CSV aberto em modo binário (por exemplo, o
+            ``UploadedFile`` do Streamlit ou um ``BytesIO``).
 
     Returns:
         DataFrame com as colunas necessárias preenchidas.
     """
-    df = pd.read_csv(io.BytesIO(csv_bytes))
+    # Lê só o cabeçalho para que o parser materialize apenas as colunas usadas,
+    # já com o tipo final das colunas numéricas.
+    cabecalho = pd.read_csv(arquivo, nrows=0).columns
+    arquivo.seek(0)
+    normalizados = cabecalho.str.strip().str.lower()
+    usecols = [c for c, n in zip(cabecalho, normalizados) if n in _COLUNAS_LOTE]
+    dtype = {c: "float64" for c, n in zip(cabecalho, normalizados) if n in _COLUNAS_LOTE[1:]}
+    try:
+        df = pd.read_csv(
+            arquivo, engine="pyarrow", dtype_backend="pyarrow", usecols=usecols, dtype=dtype
+        )
+    except ImportError:
+        # Sem o pyarrow instalado, recorre ao motor padrão do pandas
+        arquivo.seek(0)
+        df = pd.read_csv(arquivo, usecols=usecols, dtype=dtype)
     # Renomear colunas para padrão interno
-    df.columns = [c.strip().lower() for c in df.columns]
-    # Garante a presença das colunas esperadas
-    expected_cols = {
-        "nome_produto": "nome_produto",
-        "preco_cardapio": "preco_cardapio",
-        "taxa_ifood": "taxa_ifood",
-        "impostos": "impostos",
-        "margem": "margem",
-        "custo_embalagem": "custo_embalagem",
-        "custo_logistica": "custo_logistica",
-        "desconto": "desconto",
-    }
-    for col in expected_cols.values():
-        if col not in df.columns:
-            df[col] = 0.0 if col != "nome_produto" else ""
-    return df[list(expected_cols.values())].copy()
+    df.columns = df.columns.str.strip().str.lower()
+    # Mantém apenas as colunas usadas no cálculo, preenchendo as ausentes
+    if "nome_produto" not in df.columns:
+        df["nome_produto"] = ""
+    df = df.reindex(columns=_COLUNAS_LOTE, fill_value=0.0)
+    # Células numéricas vazias valem 0, e assim também recebem os valores padrão.
+    # O reindex já devolveu um DataFrame novo, então o preenchimento é feito nele.
+    df.fillna({col: 0.0 for col in _COLUNAS_LOTE[1:]}, inplace=True)
+    return df
+
+
+# Mesmo limite de _processar_lote: cada entrada também guarda um cardápio inteiro
+@st.cache_data(show_spinner=False, max_entries=8)
+def _carregar_upload(file_id: str, _arquivo: IO[bytes]) -> pd.DataFrame:
+    """Versão em cache de :func:`carregar_csv_em_lote` para arquivos enviados.
+
+    O cache é indexado apenas pelo ``file_id`` do upload (o argumento
+    ``_arquivo`` não é usado na chave), então o conteúdo só é lido quando um
+    novo arquivo é enviado.
+
+    Args:
+        file_id: identificador do arquivo enviado pelo Streamlit.
+        _arquivo: o próprio arquivo enviado.
+
+    Returns:
+        DataFrame retornado por :func:`carregar_csv_em_lote`.
+    """
+    _arquivo.seek(0)
+    return carregar_csv_em_lote(_arquivo)
+
+
+# Cada entrada guarda um cardápio inteiro (DataFrame e CSV), por isso o limite menor
+@st.cache_data(show_spinner=False, max_entries=8)
+def _processar_lote(
+    file_id: str, _arquivo: IO[bytes], taxa_padrao: float, logistica_padrao: float
+) -> tuple[pd.DataFrame, bytes]:
+    """Executa a precificação em lote completa de um arquivo enviado.
+
+    Lê o CSV, aplica os valores padrão do formulário às linhas com taxa ou
+    custo de logística vazios (0), calcula o preço sugerido e serializa o
+    resultado em CSV.  Como o cache é indexado pelo ``file_id`` e pelos
+    valores padrão, os reruns que não mudam nenhum deles não refazem o
+    trabalho.
+
+    Args:
+        file_id: identificador do arquivo enviado pelo Streamlit.
+        _arquivo: o próprio arquivo enviado (fora da chave do cache).
+        taxa_padrao: taxa do iFood (%) usada quando ``taxa_ifood`` é 0.
+        logistica_padrao: custo de logística usado quando
+            ``custo_logistica`` é 0.
+
+    Returns:
+        Tupla com o DataFrame de resultados e seu conteúdo em CSV (bytes).
+    """
+    df = _carregar_upload(file_id, _arquivo)
+    # Extrai as colunas numéricas como arrays uma única vez e aplica os valores
+    # padrão às posições vazias (0) diretamente sobre eles.
+    precos = df["preco_cardapio"].to_numpy(dtype="float64")
+    taxas = df["taxa_ifood"].to_numpy(dtype="float64", copy=True)
+    np.putmask(taxas, taxas == 0.0, taxa_padrao)
+    custos = df["custo_logistica"].to_numpy(dtype="float64", copy=True)
+    np.putmask(custos, custos == 0.0, logistica_padrao)
+    df_result = pd.DataFrame(
+        {
+            "nome_produto": df["nome_produto"],
+            "preco_cardapio": precos,
+            "taxa_ifood": taxas,
+            "custo_logistica": custos,
+            # Calcula todas as linhas de uma vez, sem iterar pelo DataFrame
+            "preco_sugerido_ifood": _calcular_preco_arrays(precos, taxas, custos),
+        }
+    )
+    return df_result, gerar_csv_bytes(df_result)
+
+
+@st.cache_resource
+def _carregar_logo() -> Optional[bytes]:
+    """Lê o arquivo do logo da Agência uma única vez por processo.
+
+    Returns:
+        Conteúdo da imagem em bytes, ou ``None`` caso o arquivo não exista
+        ou não possa ser lido.
+    """
+    try:
+        with open(_CAMINHO_LOGO, "rb") as arquivo:
+            return arquivo.read()
+    except OSError:
+        return None
+
+
+def _limpar_historico() -> None:
+    """Callback do botão "Limpar Histórico": esvazia o histórico da sessão.
+
+    Também descarta o último resultado exibido e o PDF já preparado, que
+    pertencem ao histórico apagado.
+    """
+    st.session_state.historico_rows.clear()
+    st.session_state.pop("ultimo_calculo", None)
+    st.session_state.pop("pdf_historico", None)
 
 
 def main() -> None:
@@ -171,11 +440,9 @@ def main() -> None:
     )
 
     # Exibe o logo da Agência no topo, se o arquivo existir
-    # Para evitar erros caso a imagem não esteja presente, usamos um bloco try/except.
-    try:
-        st.image("Ativo 1.png", width=180)
-    except Exception:
-        pass
+    logo = _carregar_logo()
+    if logo:
+        st.image(logo, width=180)
 
     st.title("Calculadora de Precificação iFood")
     st.markdown(
@@ -185,51 +452,13 @@ def main() -> None:
     )
 
     # Estilos CSS personalizados para botões e componentes
-    st.markdown(
-        """
-        <style>
-        /* Botão Calcular dentro do formulário */
-        form button[type="submit"] {
-            background-color: #333333 !important;
-            color: #FFFFFF !important;
-            width: 100% !important;
-        }
-        /* Primeiro botão de download (Baixar CSV) */
-        div[data-testid="stDownloadButton"]:first-of-type button {
-            background-color: #007BFF !important;
-            color: #FFFFFF !important;
-            width: 100% !important;
-        }
-        /* Segundo botão de download (Baixar PDF) */
-        div[data-testid="stDownloadButton"]:nth-of-type(2) button {
-            background-color: #000000 !important;
-            color: #FFFFFF !important;
-            width: 100% !important;
-        }
-        /* Botão para limpar histórico */
-        div[data-testid="stButton"] button {
-            background-color: #DC3545 !important;
-            color: #FFFFFF !important;
-        }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
+    st.markdown(_CSS_PERSONALIZADO, unsafe_allow_html=True)
 
-    # Inicializa histórico na sessão
-    if "historico" not in st.session_state:
-        # O histórico agora contém apenas as colunas essenciais: nome, preço de cardápio,
-        # taxa do iFood, custo de logística e preço sugerido.  Campos de impostos,
-        # margem, embalagem e desconto foram removidos conforme solicitado.
-        st.session_state.historico = pd.DataFrame(
-            columns=[
-                "Nome do Produto",
-                "Preço Cardápio (R$)",
-                "Taxa iFood (%)",
-                "Custo Logística (R$)",
-                "Preço Sugerido iFood (R$)",
-            ]
-        )
+    # Inicializa histórico na sessão.  As linhas são guardadas como uma lista de
+    # dicionários e o DataFrame só é montado na hora de exibir ou exportar, evitando
+    # copiar o histórico inteiro a cada novo cálculo.
+    if "historico_rows" not in st.session_state:
+        st.session_state.historico_rows = []
 
     with st.expander("Precificação individual", expanded=True):
         with st.form("form_precificacao"):
@@ -238,24 +467,17 @@ def main() -> None:
                 "Preço do produto no cardápio (R$)", min_value=0.0, format="%.2f"
             )
             # Seleção de plano do iFood
-            planos_ifood = {
-                "Básico (27%)": 27.0,
-                "Intermediário (21%)": 21.0,
-                "Parceiro de Entrega (16.5%)": 16.5,
-                "Próprio (12%)": 12.0,
-                "Personalizado": None,
-            }
             plano_escolhido = st.selectbox(
                 "Plano do iFood",
-                options=list(planos_ifood.keys()),
+                options=list(_PLANOS_IFOOD.keys()),
                 index=0,
             )
-            if planos_ifood[plano_escolhido] is None:
+            if _PLANOS_IFOOD[plano_escolhido] is None:
                 taxa_ifood = st.number_input(
                     "Taxa do iFood (%)", min_value=0.0, max_value=100.0, value=27.0, step=0.1
                 )
             else:
-                taxa_ifood = planos_ifood[plano_escolhido]
+                taxa_ifood = _PLANOS_IFOOD[plano_escolhido]
             # Os campos de impostos, margem, custo de embalagem e desconto foram removidos.
             # Permanece apenas o custo de logística/entrega para permitir ajuste do valor total.
             custo_logistica = st.number_input(
@@ -266,67 +488,66 @@ def main() -> None:
         if calcular_btn:
             # Validação básica
             if not nome_produto.strip():
+                st.session_state.pop("ultimo_calculo", None)
                 st.warning("Por favor, informe o nome do produto.")
             else:
-                # Com os campos de impostos, margem, embalagem e desconto removidos,
-                # passamos zeros para essas variáveis.  O custo de logística é o
-                # único acréscimo ao preço de cardápio considerado no cálculo.
-                preco_sugerido = calcular_preco_ifood(
-                    preco_cardapio=preco_cardapio,
-                    taxa_ifood=taxa_ifood,
-                    impostos=0.0,
-                    margem=0.0,
-                    custo_embalagem=0.0,
-                    custo_logistica=custo_logistica,
-                    desconto=0.0,
-                )
+                # O custo de logística é o único acréscimo ao preço de cardápio
+                # considerado no cálculo.
+                preco_sugerido = _calcular_preco(preco_cardapio, taxa_ifood, custo_logistica)
                 if preco_sugerido is None:
+                    st.session_state.pop("ultimo_calculo", None)
                     st.error(
-                        "A taxa do iFood deve ser menor que 100 %. Ajuste o valor para obter um preço válido."
+                        "A taxa do iFood deve ser menor que 100 %. Ajuste o valor para obter um preço válido."
                     )
                 else:
-                    st.success(f"Preço sugerido no iFood: R$ {preco_sugerido:.2f}")
-                    # Tabela de detalhamento com apenas os itens relevantes
-                    detalhamento = pd.DataFrame(
-                        {
-                            "Item": [
-                                "Preço no cardápio",
-                                "Custo logística",
-                                "Taxa iFood",
-                                "Preço sugerido",
-                            ],
-                            "Valor": [
-                                f"R$ {preco_cardapio:.2f}",
-                                f"R$ {custo_logistica:.2f}",
-                                f"{taxa_ifood:.1f} %",
-                                f"R$ {preco_sugerido:.2f}",
-                            ],
-                        }
+                    # Guarda só os valores calculados; o resultado é exibido abaixo a
+                    # partir deles, inclusive nos reruns disparados por outros widgets.
+                    st.session_state.ultimo_calculo = (
+                        preco_cardapio,
+                        custo_logistica,
+                        taxa_ifood,
+                        preco_sugerido,
                     )
-                    with st.expander("Ver detalhamento do cálculo"):
-                        st.table(detalhamento)
-                    # Atualiza histórico
-                    nova_linha = pd.DataFrame(
+                    # Atualiza histórico; um PDF preparado antes deixa de valer
+                    st.session_state.pop("pdf_historico", None)
+                    st.session_state.historico_rows.append(
                         {
-                            "Nome do Produto": [nome_produto],
-                            "Preço Cardápio (R$)": [round(preco_cardapio, 2)],
-                            "Taxa iFood (%)": [round(taxa_ifood, 2)],
-                            "Custo Logística (R$)": [round(custo_logistica, 2)],
-                            "Preço Sugerido iFood (R$)": [preco_sugerido],
+                            "Nome do Produto": nome_produto,
+                            "Preço Cardápio (R$)": round(preco_cardapio, 2),
+                            "Taxa iFood (%)": round(taxa_ifood, 2),
+                            "Custo Logística (R$)": round(custo_logistica, 2),
+                            "Preço Sugerido iFood (R$)": preco_sugerido,
                         }
                     )
-                    st.session_state.historico = pd.concat(
-                        [st.session_state.historico, nova_linha], ignore_index=True
-                    )
+                    # Mantém apenas os cálculos mais recentes, descartando os mais antigos
+                    if len(st.session_state.historico_rows) > _MAX_HISTORICO:
+                        del st.session_state.historico_rows[:-_MAX_HISTORICO]
+
+        ultimo_calculo = st.session_state.get("ultimo_calculo")
+        if ultimo_calculo is not None:
+            preco_calculado, logistica_calculada, taxa_calculada, preco_sugerido = ultimo_calculo
+            st.success(f"Preço sugerido no iFood: R$ {preco_sugerido:.2f}")
+            # Exibido sem um expander próprio: o bloco já está dentro do expander
+            # "Precificação individual", e o Streamlit não aceita expanders aninhados.
+            st.markdown("**Detalhamento do cálculo**")
+            st.markdown(
+                _TABELA_DETALHAMENTO.format(
+                    preco_cardapio=preco_calculado,
+                    custo_logistica=logistica_calculada,
+                    taxa_ifood=taxa_calculada,
+                    preco_sugerido=preco_sugerido,
+                )
+            )
 
     # Exibe histórico caso exista
-    if not st.session_state.historico.empty:
+    if st.session_state.historico_rows:
+        historico = pd.DataFrame(st.session_state.historico_rows, columns=_COLUNAS_HISTORICO)
         st.subheader("Histórico de precificações")
-        st.dataframe(st.session_state.historico, use_container_width=True)
+        st.dataframe(historico, use_container_width=True)
         col1, col2, col3 = st.columns(3)
         with col1:
             # Botão de download de CSV
-            csv_bytes = st.session_state.historico.to_csv(index=False).encode("utf-8")
+            csv_bytes = gerar_csv_historico(st.session_state.historico_rows, _COLUNAS_HISTORICO)
             st.download_button(
                 label="Baixar CSV",
                 data=csv_bytes,
@@ -335,32 +556,31 @@ def main() -> None:
                 use_container_width=True,
             )
         with col2:
-            # Botão de download de PDF
-            pdf_bytes = gerar_pdf_tabela(
-                st.session_state.historico,
-                titulo="Histórico de precificação iFood",
-            )
-            st.download_button(
-                label="Baixar PDF",
-                data=pdf_bytes,
-                file_name="historico_precificacao.pdf",
-                mime="application/pdf",
-                use_container_width=True,
-            )
+            # O PDF só é gerado quando o usuário pede; o botão "Preparar PDF" é
+            # então substituído, no mesmo lugar, pelo botão de download.
+            espaco_pdf = st.empty()
+            pdf_bytes = st.session_state.get("pdf_historico")
+            if pdf_bytes is None and espaco_pdf.button(
+                "Preparar PDF", key="preparar_pdf", use_container_width=True
+            ):
+                pdf_bytes = gerar_pdf_tabela(
+                    historico,
+                    titulo="Histórico de precificação iFood",
+                )
+                st.session_state.pdf_historico = pdf_bytes
+            if pdf_bytes is not None:
+                espaco_pdf.download_button(
+                    label="Baixar PDF",
+                    data=pdf_bytes,
+                    file_name="historico_precificacao.pdf",
+                    mime="application/pdf",
+                    use_container_width=True,
+                )
         with col3:
-            # Botão para limpar histórico
-            if st.button("Limpar Histórico"):
-                # Limpa o histórico
-                st.session_state.historico = st.session_state.historico.iloc[0:0]
-                # Recarrega a interface para refletir a mudança.  Utiliza st.rerun(),
-                # que é a API oficial a partir das versões recentes.  Se não
-                # estiver disponível, ignora a chamada silenciosamente.
-                try:
-                    # type: ignore[attr-defined]
-                    st.rerun()  # Streamlit 1.27+
-                except Exception:
-                    # Fallback: não força recarregar para versões antigas
-                    pass
+            # Botão para limpar histórico.  O callback roda antes do rerun disparado
+            # pelo clique, então a página já é desenhada sem o histórico, sem
+            # precisar de um segundo rerun.
+            st.button("Limpar Histórico", key="limpar_historico", on_click=_limpar_historico)
 
     st.markdown("---")
 
@@ -375,39 +595,12 @@ def main() -> None:
         )
         if arquivo is not None:
             try:
-                df = carregar_csv_em_lote(arquivo.getvalue())
-                # Aplica valores padrão se estiverem vazios (0) usando os valores definidos no formulário
-                df["taxa_ifood"] = df["taxa_ifood"].replace(0, taxa_ifood)
-                df["custo_logistica"] = df["custo_logistica"].replace(0, custo_logistica)
-                # Para colunas que não são utilizadas (impostos, margem, embalagem, desconto),
-                # substituímos por zero para não interferir no cálculo.
-                if "impostos" in df.columns:
-                    df["impostos"] = 0.0
-                if "margem" in df.columns:
-                    df["margem"] = 0.0
-                if "custo_embalagem" in df.columns:
-                    df["custo_embalagem"] = 0.0
-                if "desconto" in df.columns:
-                    df["desconto"] = 0.0
-                # Calcula para cada linha
-                precos = []
-                for _, linha in df.iterrows():
-                    preco = calcular_preco_ifood(
-                        preco_cardapio=float(linha.get("preco_cardapio", 0)),
-                        taxa_ifood=float(linha.get("taxa_ifood", taxa_ifood)),
-                        impostos=0.0,
-                        margem=0.0,
-                        custo_embalagem=0.0,
-                        custo_logistica=float(linha.get("custo_logistica", custo_logistica)),
-                        desconto=0.0,
-                    )
-                    precos.append(preco if preco is not None else 0.0)
-                df_result = df[["nome_produto", "preco_cardapio", "taxa_ifood", "custo_logistica"]].copy()
-                df_result["preco_sugerido_ifood"] = precos
+                df_result, csv_lote = _processar_lote(
+                    arquivo.file_id, arquivo, taxa_ifood, custo_logistica
+                )
                 st.success("Arquivo processado com sucesso!")
                 st.dataframe(df_result, use_container_width=True)
                 # Download resultante
-                csv_lote = df_result.to_csv(index=False).encode("utf-8")
                 st.download_button(
                     label="Baixar resultados (CSV)",
                     data=csv_lote,